@@ -7,9 +7,75 @@ Generates intelligent summaries of any file type.
 import os
 import sys
 import argparse
+import asyncio
 import json
+import time
+import hashlib
+import importlib
+import mmap
+import multiprocessing
+import threading
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CACHE_DIR = Path("~/.cache/summarize").expanduser()
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_MAX_TOKENS = 8000  # text-embedding-3-small accepts up to 8191
+EMBEDDING_TOKEN_CHARS = 16  # Generous bound on the average characters per token
+EMBEDDING_FALLBACK_CHARS = 2500  # Safe even for CJK text when tokens can't be counted
+SEMANTIC_THRESHOLD = 0.95
+SUMMARY_SUFFIX = ".summary.txt"
+PACK_MAX_CHARS = 80000
+PACK_MAX_ITEMS = 20  # Keeps a packed response well within the output token limit
+PDF_PAGES_PER_WORKER = 100
+ENCODING_SAMPLE_BYTES = 65536
+ENCODING_MAX_CHAOS = 0.1  # Highest charset-normalizer mess ratio trusted for a multi-byte match
+MAX_CONTENT_CHARS = 100000  # Fallback limit when tokens can't be counted
+MAX_READ_CHARS = 600000  # Enough text to fill a 128k-token context
+PROMPT_RESERVE_TOKENS = 2000  # Room for the system prompt and the summary
+DEFAULT_MODELS = {
+    "brief": "gpt-4.1-nano",  # Short summaries don't need a larger model
+    "medium": "gpt-4o-mini",
+    "detailed": "gpt-4o-mini",
+}
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4.1-nano": 1047576,
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+TINY_FILE_CHARS = 200  # Brief "summaries" of files this short are the file itself
+SHORT_FILE_CHARS = 1000  # Files this short only get a brief summary
+OFFLINE_SENTENCES = {'brief': 3, 'medium': 5, 'detailed': 10}
+BATCH_FINAL_STATES = {'completed', 'failed', 'expired', 'cancelled'}
+READER_PACKAGES = {
+    '.pdf': ('pypdfium2', 'pypdfium2'),
+    '.docx': ('docx', 'python-docx'),
+    '.doc': ('docx', 'python-docx'),
+}
+
+_client = None
+_PDFIUM_LOCK = threading.Lock()
+
+def json_dumps(obj):
+    """Serialize obj to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def json_loads(data):
+    """Parse JSON from str or bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 def check_openai_available():
     """Check if OpenAI package is available and API key is set."""
     try:
@@ -18,11 +84,30 @@ def check_openai_available():
     except ImportError:
         return False
 
-def install_dependencies():
-    """Install required dependencies."""
-    print("Installing required packages...")
-    os.system(f"{sys.executable} -m pip install openai PyPDF2 python-docx --break-system-packages -q")
-    print("Dependencies installed successfully.")
+def _require(module, pip_name=None):
+    """Exit with an install hint if a required package is missing."""
+    try:
+        importlib.import_module(module)
+    except ImportError:
+        raise SystemExit(f"ERROR: {module} is not installed. Install it with: pip install {pip_name or module}")
+
+def require_dependencies(paths, offline=False):
+    """Check up front that the packages needed to summarize paths are installed."""
+    if offline:
+        _require('sumy')
+    else:
+        _require('openai')
+    for suffix in {Path(p).suffix.lower() for p in paths}:
+        if suffix in READER_PACKAGES:
+            _require(*READER_PACKAGES[suffix])
+
+def _get_client(api_key):
+    """Return a shared OpenAI client so HTTP connections are reused across calls."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=api_key)
+    return _client
 
 def get_api_key():
     """Get OpenAI API key from environment."""
@@ -35,58 +120,154 @@ def get_api_key():
         sys.exit(1)
     return api_key
 
-def read_text_file(file_path):
-    """Read a text file with encoding detection."""
-    encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+def detect_encoding(sample):
+    """Guess the encoding of a byte sample, defaulting to UTF-8."""
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample is still UTF-8
+        if e.start >= len(sample) - 3 and e.reason == 'unexpected end of data':
+            return 'utf-8'
     
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                return f.read()
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            print(f"Error reading file: {e}", file=sys.stderr)
-            return None
+    try:
+        import charset_normalizer
+        from charset_normalizer.utils import is_multi_byte_encoding
+    except ImportError:
+        return _western_encoding(sample)
     
-    print(f"Unable to read file with common encodings", file=sys.stderr)
-    return None
+    # Single-byte guesses are unreliable on short samples (Latin-1 French is
+    # often reported as cp1250), so only trust clean multi-byte matches like GBK
+    best = charset_normalizer.from_bytes(sample).best()
+    if best and is_multi_byte_encoding(best.encoding) and best.chaos <= ENCODING_MAX_CHAOS:
+        return best.encoding
+    return _western_encoding(sample)
+
+def _western_encoding(sample):
+    """Pick cp1252 if it decodes sample, else Latin-1, which decodes any bytes."""
+    try:
+        sample.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
 
-def read_pdf(file_path):
-    """Extract text from PDF file."""
+def read_text_file(file_path, max_chars=None):
+    """Read a text file with encoding detection.
+    
+    If max_chars is set, at most max_chars + 1 characters are decoded.
+    """
     try:
-        import PyPDF2
-        text_parts = []
         with open(file_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            for page in pdf_reader.pages:
-                text_parts.append(page.extract_text())
-        return '\n\n'.join(text_parts)
-    except ImportError:
-        print("PyPDF2 not installed. Installing...", file=sys.stderr)
-        install_dependencies()
-        return read_pdf(file_path)
+            if os.fstat(f.fileno()).st_size == 0:
+                return ''
+            # Detect the encoding on a prefix, then decode the file once
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                encoding = detect_encoding(mm[:ENCODING_SAMPLE_BYTES])
+                if max_chars is None:
+                    return mm[:].decode(encoding, errors='replace')
+                # No common encoding uses more than 4 bytes per character
+                text = mm[:4 * (max_chars + 1)].decode(encoding, errors='replace')
+                return text[:max_chars + 1]
     except Exception as e:
-        print(f"Error reading PDF: {e}", file=sys.stderr)
+        print(f"Error reading file: {e}", file=sys.stderr)
         return None
 
-def read_docx(file_path):
-    """Extract text from Word document."""
+def _page_text(pdf, index):
+    """Extract the text of one page from an open pypdfium2 document."""
+    page = pdf[index]
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range().replace('\r\n', '\n')
+    finally:
+        textpage.close()
+        page.close()
+
+def _extract_pages(args):
+    """Extract text from a range of PDF pages. Runs in a worker process."""
+    import pypdfium2 as pdfium
+    file_path, start, stop = args
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return [_page_text(pdf, i) for i in range(start, stop)]
+    finally:
+        pdf.close()
+
+def _join_until(chunks, max_chars=None, sep='\n\n'):
+    """Join text chunks, stopping once the result exceeds max_chars."""
+    parts, total = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        total += len(chunk) + len(sep)
+        if max_chars is not None and total > max_chars:
+            break
+    return sep.join(parts)
+
+def read_pdf(file_path, max_chars=None):
+    """Extract text from PDF file.
+    
+    If max_chars is set, extraction stops once more than max_chars characters
+    have been read.
+    """
+    # PDFium is not thread-safe, and --concurrent reads files from a thread
+    # pool, so only one PDF is parsed at a time
+    with _PDFIUM_LOCK:
+        try:
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(str(file_path))
+            try:
+                num_pages = len(pdf)
+                workers = min(os.cpu_count() or 1, num_pages // PDF_PAGES_PER_WORKER)
+                if workers < 2:
+                    pages = (_page_text(pdf, i) for i in range(num_pages))
+                    return _join_until(pages, max_chars)
+            finally:
+                pdf.close()
+            
+            # PDFium documents can't be shared across threads or pickled, so split
+            # large PDFs into page ranges and extract them in parallel processes,
+            # each opening the file once for its range. Workers are spawned rather
+            # than forked because this may run on a thread pool thread.
+            ranges = [(str(file_path), start, min(start + PDF_PAGES_PER_WORKER, num_pages))
+                      for start in range(0, num_pages, PDF_PAGES_PER_WORKER)]
+            mp_context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+                futures = [executor.submit(_extract_pages, r) for r in ranges]
+                pages = (text for future in futures for text in future.result())
+                text = _join_until(pages, max_chars)
+                # Don't extract ranges past the point where we have enough text
+                executor.shutdown(cancel_futures=True)
+            return text
+        except Exception as e:
+            print(f"Error reading PDF: {e}", file=sys.stderr)
+            return None
+
+def read_docx(file_path, max_chars=None):
+    """Extract text from Word document.
+    
+    If max_chars is set, extraction stops once more than max_chars characters
+    have been read.
+    """
     try:
         from docx import Document
         doc = Document(file_path)
-        text_parts = [paragraph.text for paragraph in doc.paragraphs]
-        return '\n\n'.join(text_parts)
-    except ImportError:
-        print("python-docx not installed. Installing...", file=sys.stderr)
-        install_dependencies()
-        return read_docx(file_path)
+        return _join_until((paragraph.text for paragraph in doc.paragraphs), max_chars)
     except Exception as e:
         print(f"Error reading DOCX: {e}", file=sys.stderr)
         return None
 
-def read_file(file_path):
-    """Read file content based on file type."""
+_READERS = {
+    '.pdf': read_pdf,
+    '.docx': read_docx,
+    '.doc': read_docx,
+}
+
+def read_file(file_path, max_chars=MAX_READ_CHARS):
+    """Read file content based on file type.
+    
+    Reading stops shortly after max_chars characters, so very large files are
+    never fully decoded. Content is truncated to the model's context later by
+    build_messages(). Pass max_chars=None to read the whole file.
+    """
     file_path = Path(file_path)
     
     if not file_path.exists():
@@ -98,71 +279,306 @@ def read_file(file_path):
         return None
     
     suffix = file_path.suffix.lower()
+    if suffix == '.doc':
+        print("WARNING: .doc format may not be fully supported. Consider converting to .docx", file=sys.stderr)
     
-    # PDF files
-    if suffix == '.pdf':
-        return read_pdf(file_path)
+    # Anything without a dedicated reader is read as text (most common)
+    reader = _READERS.get(suffix, read_text_file)
+    return reader(file_path, max_chars)
+
+# The user message is the raw file content, so each prompt says what to do with it
+_PROMPTS = {
+    'brief': """Summarize the user's content in 2-3 sentences covering only the most critical points. 
+Be direct and factual.""",
     
-    # Word documents
-    elif suffix in ['.docx', '.doc']:
-        if suffix == '.doc':
-            print("WARNING: .doc format may not be fully supported. Consider converting to .docx", file=sys.stderr)
-        return read_docx(file_path)
+    'medium': """Summarize the user's content in one well-structured paragraph covering the main ideas 
+and key takeaways. Be comprehensive but concise.""",
     
-    # Text-based files (most common)
-    else:
-        return read_text_file(file_path)
+    'detailed': """Summarize the user's content in multiple paragraphs covering its purpose, key points, 
+important details and structure, and conclusions. Be thorough but clear."""
+}
 
 def get_system_prompt(detail_level):
     """Get system prompt based on detail level."""
-    prompts = {
-        'brief': """You are a professional summarizer. Provide a concise summary in 2-3 sentences 
-highlighting only the most critical points. Be direct and factual.""",
-        
-        'medium': """You are a professional summarizer. Provide a clear summary in one well-structured 
-paragraph covering the main ideas, key takeaways, and most important information. 
-Be comprehensive but concise.""",
-        
-        'detailed': """You are a professional summarizer. Provide a comprehensive summary with 
-multiple paragraphs covering:
-1. Main themes and purpose
-2. Key points and arguments
-3. Important details and structure
-4. Conclusions or outcomes
-Be thorough while maintaining clarity."""
-    }
+    return _PROMPTS.get(detail_level, _PROMPTS['medium'])
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    """Return the tiktoken encoding for a model, or None if unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails offline
+        print(f"WARNING: Could not load tokenizer, falling back to character limits: {e}", file=sys.stderr)
+        return None
+
+def truncate_content(content, model):
+    """Truncate content to fit the model's context window.
+    
+    Returns (content, num_tokens), where num_tokens is the size of the content
+    before truncation, or None if no tokenizer is available.
+    """
+    enc = get_encoding(model)
+    budget = MODEL_CONTEXT_TOKENS.get(model)
+    if enc is not None and budget is not None:
+        # read_file() stops just past MAX_READ_CHARS, so longer content means
+        # the file was cut short even if it fits the model's context
+        read_limit_hit = len(content) > MAX_READ_CHARS
+        content = content[:MAX_READ_CHARS]
+        budget -= PROMPT_RESERVE_TOKENS
+        tokens = enc.encode(content, disallowed_special=())
+        if len(tokens) > budget:
+            print(f"NOTE: File is very large ({len(tokens)} tokens). Truncating to {budget} tokens.", file=sys.stderr)
+            return enc.decode(tokens[:budget]) + "\n\n[Content truncated...]", len(tokens)
+        if read_limit_hit:
+            print(f"NOTE: File is very large. Truncating to {MAX_READ_CHARS} chars.", file=sys.stderr)
+            return content + "\n\n[Content truncated...]", len(tokens)
+        return content, len(tokens)
     
-    return prompts.get(detail_level, prompts['medium'])
+    if len(content) > MAX_CONTENT_CHARS:
+        print(f"NOTE: File is very large. Truncating to {MAX_CONTENT_CHARS} chars.", file=sys.stderr)
+        return content[:MAX_CONTENT_CHARS] + "\n\n[Content truncated...]", None
+    return content, None
+
+_PACK_INSTRUCTIONS = """
+
+The content holds several independent items, each starting with a ---ITEM id=N--- line. 
+Summarize each item separately. Respond with a JSON object {"summaries": [{"id": int, "summary": str}]}."""
+
+def build_messages(content, detail_level, model, log_size=False):
+    """Build the chat messages for summarizing content.
+    
+    With log_size, the file size is reported from the same tokenization used
+    for truncation, so content is only encoded once.
+    """
+    size = len(content)
+    content, num_tokens = truncate_content(content, model)
+    if log_size:
+        if num_tokens is not None:
+            print(f"File size: {num_tokens} tokens", file=sys.stderr)
+        else:
+            print(f"File size: {size} characters", file=sys.stderr)
+    return [
+        {"role": "system", "content": get_system_prompt(detail_level)},
+        {"role": "user", "content": content}
+    ]
+
+@lru_cache(maxsize=None)
+def get_pack_system_prompt(detail_level):
+    """Get the system prompt for packed requests, built once per detail level."""
+    return get_system_prompt(detail_level) + _PACK_INSTRUCTIONS
+
+def build_pack_messages(contents, detail_level):
+    """Build chat messages asking for one summary per item, returned as JSON."""
+    items = "\n".join(f"---ITEM id={i}---\n{content}" for i, content in enumerate(contents))
+    return [
+        {"role": "system", "content": get_pack_system_prompt(detail_level)},
+        {"role": "user", "content": items}
+    ]
 
-def summarize_content(content, detail_level, model, api_key):
-    """Send content to OpenAI for summarization."""
+def cache_key(content, detail_level, model):
+    """Build a cache key from the model, detail level and file content."""
+    return hashlib.sha256(f"{model}|{detail_level}|{content}".encode()).hexdigest()
+
+def cache_get(key, ttl=None):
+    """Return a cached summary, or None on a miss or expired entry."""
+    cache_file = CACHE_DIR / f"{key}.json"
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
+        with open(cache_file, 'rb') as f:
+            obj = json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+    
+    if ttl is not None and time.time() - obj.get('ts', 0) > ttl:
+        return None
+    return obj.get('summary')
+
+def cache_set(key, summary, model):
+    """Atomically write a summary to the cache. Failures are non-fatal."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json_dumps({"summary": summary, "model": model, "ts": time.time()}))
+        os.replace(tmp_path, CACHE_DIR / f"{key}.json")
+    except OSError as e:
+        print(f"WARNING: Could not write summary cache: {e}", file=sys.stderr)
+
+def _load_semantic_index():
+    """Load the embedding matrix and its summary records from the cache dir."""
+    import numpy as np
+    emb_file = CACHE_DIR / "embeddings.npy"
+    records_file = CACHE_DIR / "summaries.jsonl"
+    try:
+        matrix = np.load(emb_file)
+        with open(records_file, 'rb') as f:
+            records = [json_loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return None, []
+    
+    # Keep rows and records aligned if a previous write was interrupted
+    n = min(len(matrix), len(records))
+    return matrix[:n], records[:n]
+
+def semantic_lookup(client, content, detail_level, model):
+    """Embed content and look for a near-duplicate with a cached summary.
+    
+    Returns (summary, embedding). summary is None on a miss.
+    """
+    import numpy as np
+    enc = get_encoding(EMBEDDING_MODEL)
+    if enc is not None:
+        # Tokens average far fewer than EMBEDDING_TOKEN_CHARS characters, so this
+        # prefix holds the first EMBEDDING_MAX_TOKENS tokens without encoding the
+        # rest of a large file
+        head = content[:EMBEDDING_MAX_TOKENS * EMBEDDING_TOKEN_CHARS]
+        text = enc.decode(enc.encode(head, disallowed_special=())[:EMBEDDING_MAX_TOKENS])
+    else:
+        text = content[:EMBEDDING_FALLBACK_CHARS]
+    response = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    query = np.asarray(response.data[0].embedding, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+    
+    matrix, records = _load_semantic_index()
+    if matrix is None or not records or matrix.shape[1] != query.shape[0]:
+        return None, query
+    
+    sims = matrix @ query
+    for i in np.argsort(sims)[::-1]:
+        if sims[i] < SEMANTIC_THRESHOLD:
+            break
+        record = records[i]
+        if record.get('detail') == detail_level and record.get('model') == model:
+            return record['summary'], query
+    return None, query
+
+def semantic_store(query, summary, detail_level, model):
+    """Append an embedding and its summary to the semantic cache."""
+    import numpy as np
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        matrix, records = _load_semantic_index()
+        if matrix is None or matrix.shape[1] != query.shape[0]:
+            matrix, records = np.empty((0, query.shape[0]), dtype=np.float32), []
+        matrix = np.vstack([matrix, query[None, :]])
+        records.append({"summary": summary, "detail": detail_level, "model": model, "ts": time.time()})
+        
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.npy')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, matrix)
+        fd, tmp_records = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            for record in records:
+                f.write(json_dumps(record) + b"\n")
+        os.replace(tmp_path, CACHE_DIR / "embeddings.npy")
+        os.replace(tmp_records, CACHE_DIR / "summaries.jsonl")
+    except OSError as e:
+        print(f"WARNING: Could not write semantic cache: {e}", file=sys.stderr)
+
+def is_tiny(content, detail_level):
+    """Return True if content is short enough to serve as its own brief summary."""
+    return detail_level == 'brief' and len(content.strip()) < TINY_FILE_CHARS
+
+def offline_language(content):
+    """Pick the sumy tokenizer language for content: chinese or english."""
+    sample = "".join(content[:ENCODING_SAMPLE_BYTES].split())
+    cjk = sum(1 for ch in sample if '\u4e00' <= ch <= '\u9fff')
+    return 'chinese' if sample and cjk / len(sample) > 0.1 else 'english'
+
+def require_offline_language(language):
+    """Exit with an install hint if the tokenizer data for language is missing."""
+    if language == 'chinese':
+        _require('jieba')
+        return
+    import nltk
+    try:
+        nltk.data.find(f'tokenizers/punkt_tab/{language}/')
+    except LookupError:
+        raise SystemExit(f"ERROR: NLTK tokenizer data for {language} is missing. "
+                         "Install it with: python -m nltk.downloader punkt_tab")
+
+def summarize_offline(content, detail_level, language='english'):
+    """Summarize content locally with TextRank, without calling the API."""
+    try:
+        from sumy.nlp.tokenizers import Tokenizer
+        from sumy.parsers.plaintext import PlaintextParser
+        from sumy.summarizers.text_rank import TextRankSummarizer
         
-        # Truncate very long content to avoid token limits
-        max_chars = 100000  # Roughly 25k tokens
-        if len(content) > max_chars:
-            print(f"NOTE: File is very large ({len(content)} chars). Truncating to {max_chars} chars.", file=sys.stderr)
-            content = content[:max_chars] + "\n\n[Content truncated...]"
+        parser = PlaintextParser.from_string(content[:MAX_CONTENT_CHARS], Tokenizer(language))
+        sentences = TextRankSummarizer()(parser.document, OFFLINE_SENTENCES[detail_level])
+        separator = "" if language == 'chinese' else " "
+        return separator.join(str(sentence) for sentence in sentences)
+    except Exception as e:
+        print(f"ERROR: Failed to generate offline summary: {e}", file=sys.stderr)
+        return None
+
+def summarize_content(content, detail_level, model, api_key, use_cache=True, ttl=None,
+                      semantic_cache=False, stream=None):
+    """Send content to OpenAI for summarization.
+    
+    If stream is a file object, the summary is also written to it as it is
+    generated.
+    """
+    key = cache_key(content, detail_level, model)
+    if use_cache:
+        cached = cache_get(key, ttl)
+        if cached is not None:
+            print("Using cached summary", file=sys.stderr)
+            if stream is not None:
+                stream.write(cached)
+            return cached
+    
+    try:
+        client = _get_client(api_key)
         
-        system_prompt = get_system_prompt(detail_level)
+        query = None
+        if semantic_cache:
+            try:
+                similar, query = semantic_lookup(client, content, detail_level, model)
+            except ImportError:
+                print("WARNING: numpy not installed, skipping semantic cache", file=sys.stderr)
+                semantic_cache, similar = False, None
+            except Exception as e:
+                print(f"WARNING: Semantic cache lookup failed: {e}", file=sys.stderr)
+                semantic_cache, similar = False, None
+            if similar is not None:
+                print("Using cached summary of a near-identical file", file=sys.stderr)
+                if stream is not None:
+                    stream.write(similar)
+                return similar
         
         response = client.chat.completions.create(
             model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Please summarize the following content:\n\n{content}"}
-            ],
+            messages=build_messages(content, detail_level, model, log_size=True),
             temperature=0.3,  # Lower temperature for more factual summaries
+            stream=stream is not None,
         )
         
-        return response.choices[0].message.content
+        if stream is not None:
+            parts = []
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                parts.append(delta)
+                stream.write(delta)
+                stream.flush()
+            summary = "".join(parts)
+        else:
+            summary = response.choices[0].message.content
+        if use_cache and summary:
+            cache_set(key, summary, model)
+        if semantic_cache and query is not None and summary:
+            semantic_store(query, summary, detail_level, model)
+        return summary
         
-    except ImportError:
-        print("OpenAI package not installed. Installing...", file=sys.stderr)
-        install_dependencies()
-        return summarize_content(content, detail_level, model, api_key)
     except Exception as e:
         print(f"ERROR: Failed to generate summary: {e}", file=sys.stderr)
         print("\nPlease check:", file=sys.stderr)
@@ -171,6 +587,299 @@ def summarize_content(content, detail_level, model, api_key):
         print("  3. The OpenAI API service is accessible", file=sys.stderr)
         return None
 
+def collect_files(directory):
+    """List files under a directory, skipping hidden files and previous summaries."""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(names):
+            if name.startswith('.') or name.endswith(SUMMARY_SUFFIX):
+                continue
+            files.append(Path(root) / name)
+    return files
+
+def write_summary(file_path, summary):
+    """Write a summary next to its source file as <file>.summary.txt."""
+    out_path = Path(f"{file_path}{SUMMARY_SUFFIX}")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(summary + "\n")
+    print(f"Wrote {out_path}", file=sys.stderr)
+
+def count_paths(pending):
+    """Count the files covered by a pending map from collect_pending()."""
+    return sum(len(paths) for _, paths in pending.values())
+
+def collect_pending(directory, detail_level, model, use_cache=True, ttl=None):
+    """Read every file in a directory and work out which still need summarizing.
+    
+    Tiny files and cache hits are written immediately. Files with identical
+    content are grouped so each is summarized once. Returns (failed, pending)
+    where pending maps each cache key to (content, [paths]).
+    """
+    failed = 0
+    pending = {}
+    for file_path in collect_files(directory):
+        content = read_file(file_path)
+        if not content or not content.strip():
+            print(f"WARNING: Skipping empty or unreadable file: {file_path}", file=sys.stderr)
+            failed += 1
+            continue
+        if is_tiny(content, detail_level):
+            write_summary(file_path, content.strip())
+            continue
+        key = cache_key(content, detail_level, model)
+        if key in pending:
+            pending[key][1].append(file_path)
+            continue
+        cached = cache_get(key, ttl) if use_cache else None
+        if cached is not None:
+            write_summary(file_path, cached)
+        else:
+            pending[key] = (content, [file_path])
+    
+    duplicates = sum(len(paths) - 1 for _, paths in pending.values())
+    if duplicates:
+        print(f"Skipping {duplicates} duplicate files, their summaries will be copied", file=sys.stderr)
+    return failed, pending
+
+def wait_for_batch(client, batch_id, poll_interval=5, max_interval=120):
+    """Poll a batch job with exponential backoff until it reaches a final state."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_FINAL_STATES:
+            return batch
+        counts = batch.request_counts
+        progress = f" ({counts.completed}/{counts.total})" if counts else ""
+        print(f"Batch {batch_id} is {batch.status}{progress}, checking again in {poll_interval}s...",
+              file=sys.stderr)
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, max_interval)
+
+def summarize_batch(directory, detail_level, model, api_key, use_cache=True, ttl=None):
+    """Summarize every file in a directory through the OpenAI Batch API.
+    
+    Writes <file>.summary.txt next to each input and returns the number of
+    files that failed.
+    """
+    if not Path(directory).is_dir():
+        print(f"ERROR: Path is not a directory: {directory}", file=sys.stderr)
+        return 1
+    
+    failed, pending = collect_pending(directory, detail_level, model, use_cache, ttl)
+    if not pending:
+        return failed
+    
+    client = _get_client(api_key)
+    
+    fd, batch_input = tempfile.mkstemp(suffix='.jsonl')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for key, (content, _) in pending.items():
+                request = {
+                    "custom_id": key,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": model,
+                        "messages": build_messages(content, detail_level, model),
+                        "temperature": 0.3,
+                    },
+                }
+                f.write(json_dumps(request) + b"\n")
+        
+        with open(batch_input, 'rb') as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"Submitted batch {batch.id} with {len(pending)} requests", file=sys.stderr)
+        batch = wait_for_batch(client, batch.id)
+        if batch.status != 'completed':
+            print(f"ERROR: Batch {batch.id} ended with status {batch.status}", file=sys.stderr)
+            return failed + count_paths(pending)
+        # Successful requests go to the output file and failed ones to the error file
+        output = b"\n".join(client.files.content(file_id).content
+                            for file_id in (batch.output_file_id, batch.error_file_id) if file_id)
+    except Exception as e:
+        print(f"ERROR: Batch summarization failed: {e}", file=sys.stderr)
+        return failed + count_paths(pending)
+    finally:
+        os.unlink(batch_input)
+    
+    reported = set()
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        result = json_loads(line)
+        key = result["custom_id"]
+        reported.add(key)
+        paths = pending[key][1]
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            reason = result.get("error") or (response.get("body") or {}).get("error") or response.get("body")
+            for file_path in paths:
+                print(f"ERROR: Failed to summarize {file_path}: {reason}", file=sys.stderr)
+            continue
+        summary = response["body"]["choices"][0]["message"]["content"]
+        del pending[key]
+        if use_cache and summary:
+            cache_set(key, summary, model)
+        for file_path in paths:
+            write_summary(file_path, summary)
+    
+    for key in pending.keys() - reported:
+        for file_path in pending[key][1]:
+            print(f"ERROR: Batch returned no result for {file_path}", file=sys.stderr)
+    return failed + count_paths(pending)
+
+def pack_files(items, max_chars=PACK_MAX_CHARS, max_items=PACK_MAX_ITEMS):
+    """Group (key, content, paths) items so each group's content fits in max_chars.
+    
+    Groups also hold at most max_items items, so all their summaries fit in one
+    response.
+    """
+    groups, current, size = [], [], 0
+    for item in items:
+        length = len(item[1])
+        if current and (size + length > max_chars or len(current) >= max_items):
+            groups.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += length
+    if current:
+        groups.append(current)
+    return groups
+
+def summarize_item(item, detail_level, model, api_key, use_cache=True, ttl=None):
+    """Summarize one (key, content, paths) item on its own. Returns the number of failed files."""
+    _, content, paths = item
+    summary = summarize_content(content, detail_level, model, api_key, use_cache, ttl)
+    if summary is None:
+        return len(paths)
+    for file_path in paths:
+        write_summary(file_path, summary)
+    return 0
+
+def summarize_pack(directory, detail_level, model, api_key, use_cache=True, ttl=None):
+    """Summarize every file in a directory, packing several files into each request.
+    
+    Writes <file>.summary.txt next to each input and returns the number of
+    files that failed.
+    """
+    if not Path(directory).is_dir():
+        print(f"ERROR: Path is not a directory: {directory}", file=sys.stderr)
+        return 1
+    
+    failed, pending = collect_pending(directory, detail_level, model, use_cache, ttl)
+    if not pending:
+        return failed
+    
+    client = _get_client(api_key)
+    
+    items = [(key, content, paths) for key, (content, paths) in pending.items()]
+    groups = pack_files(items)
+    print(f"Summarizing {len(items)} files in {len(groups)} requests", file=sys.stderr)
+    for group in groups:
+        # A file too large to share a request is summarized on its own
+        if len(group) == 1:
+            failed += summarize_item(group[0], detail_level, model, api_key, use_cache, ttl)
+            continue
+        
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=build_pack_messages([content for _, content, _ in group], detail_level),
+                response_format={"type": "json_object"},
+                temperature=0.3,
+            )
+            results = json_loads(response.choices[0].message.content)["summaries"]
+            summaries = {int(r["id"]): r["summary"] for r in results}
+        except Exception as e:
+            print(f"WARNING: Packed request failed, summarizing its files one by one: {e}", file=sys.stderr)
+            summaries = {}
+        
+        for i, item in enumerate(group):
+            key, _, paths = item
+            summary = summaries.get(i)
+            if not summary:
+                failed += summarize_item(item, detail_level, model, api_key, use_cache, ttl)
+                continue
+            if use_cache:
+                cache_set(key, summary, model)
+            for file_path in paths:
+                write_summary(file_path, summary)
+    
+    return failed
+
+async def summarize_one(file_path, client, sem, inflight, detail_level, model, use_cache=True, ttl=None):
+    """Read and summarize one file on the event loop. Returns True on success.
+    
+    inflight maps cache keys to futures shared by all tasks, so files with
+    identical content are only sent to the API once.
+    """
+    loop = asyncio.get_running_loop()
+    async with sem:
+        # PDF/DOCX parsing is blocking, so keep it off the event loop
+        content = await loop.run_in_executor(None, read_file, file_path)
+    if not content or not content.strip():
+        print(f"WARNING: Skipping empty or unreadable file: {file_path}", file=sys.stderr)
+        return False
+    
+    if is_tiny(content, detail_level):
+        write_summary(file_path, content.strip())
+        return True
+    
+    key = cache_key(content, detail_level, model)
+    if key in inflight:
+        # Another task is already summarizing identical content
+        summary = await inflight[key]
+    else:
+        inflight[key] = future = loop.create_future()
+        summary = cache_get(key, ttl) if use_cache else None
+        if summary is None:
+            async with sem:
+                try:
+                    response = await client.chat.completions.create(
+                        model=model,
+                        messages=build_messages(content, detail_level, model),
+                        temperature=0.3,
+                    )
+                    summary = response.choices[0].message.content
+                except Exception as e:
+                    print(f"ERROR: Failed to summarize {file_path}: {e}", file=sys.stderr)
+            if use_cache and summary:
+                cache_set(key, summary, model)
+        future.set_result(summary)
+    
+    if not summary:
+        return False
+    write_summary(file_path, summary)
+    return True
+
+async def summarize_concurrent(directory, detail_level, model, api_key, concurrency=8,
+                               use_cache=True, ttl=None):
+    """Summarize every file in a directory with up to `concurrency` requests in flight.
+    
+    Writes <file>.summary.txt next to each input and returns the number of
+    files that failed.
+    """
+    if not Path(directory).is_dir():
+        print(f"ERROR: Path is not a directory: {directory}", file=sys.stderr)
+        return 1
+    
+    from openai import AsyncOpenAI
+    client = AsyncOpenAI(api_key=api_key)
+    sem = asyncio.Semaphore(concurrency)
+    inflight = {}
+    
+    paths = collect_files(directory)
+    results = await asyncio.gather(*[
+        summarize_one(p, client, sem, inflight, detail_level, model, use_cache, ttl) for p in paths
+    ])
+    return results.count(False)
+
 def main():
     parser = argparse.ArgumentParser(
         description='Summarize any file using OpenAI API',
@@ -180,6 +889,9 @@ Examples:
   %(prog)s document.pdf --detail medium
   %(prog)s code.py --detail brief
   %(prog)s report.docx --detail detailed --model gpt-4o
+  %(prog)s --batch docs/ --detail brief
+  %(prog)s --batch docs/ --concurrent 8
+  %(prog)s --batch snippets/ --pack
 
 Detail Levels:
   brief    - 2-3 sentences with key points only
@@ -191,12 +903,40 @@ Detail Levels:
     parser.add_argument('file_path', nargs='?', help='Path to file to summarize')
     parser.add_argument('--detail', choices=['brief', 'medium', 'detailed'], 
                         default='medium', help='Level of detail (default: medium)')
-    parser.add_argument('--model', default='gpt-4o-mini',
-                        help='OpenAI model to use (default: gpt-4o-mini)')
+    parser.add_argument('--model', default=None,
+                        help='OpenAI model to use (default: gpt-4.1-nano for brief, '
+                             'gpt-4o-mini otherwise)')
+    parser.add_argument('--batch', metavar='DIR',
+                        help='Summarize every file in DIR via the Batch API, writing <file>.summary.txt')
+    parser.add_argument('--concurrent', metavar='K', type=int, nargs='?', const=8,
+                        help='With --batch, call the API directly with K parallel requests '
+                             'instead of submitting a batch job (default K: 8)')
+    parser.add_argument('--pack', action='store_true',
+                        help='With --batch, pack several small files into each API request')
+    parser.add_argument('--offline', action='store_true',
+                        help='Summarize locally with TextRank instead of calling the API (requires sumy)')
     parser.add_argument('--check-config', action='store_true',
                         help='Check if API key is configured')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Bypass the local summary cache (~/.cache/summarize)')
+    parser.add_argument('--ttl', type=float, default=None,
+                        help='Max age of cached summaries in seconds (default: never expire)')
+    parser.add_argument('--semantic-cache', action='store_true',
+                        help='Reuse summaries of near-identical files via embeddings (requires numpy)')
     
     args = parser.parse_args()
+    if not args.batch:
+        for flag, value in (('--concurrent', args.concurrent), ('--pack', args.pack)):
+            if value:
+                parser.error(f'{flag} requires --batch')
+    if args.concurrent is not None and args.concurrent < 1:
+        parser.error('--concurrent must be at least 1')
+    if args.pack and args.concurrent:
+        parser.error('--pack and --concurrent cannot be combined')
+    if args.offline and args.batch:
+        parser.error('--offline cannot be combined with --batch')
+    if args.semantic_cache and args.batch:
+        parser.error('--semantic-cache cannot be combined with --batch')
     
     # Check configuration only
     if args.check_config:
@@ -206,7 +946,7 @@ Detail Levels:
             if check_openai_available():
                 print("✓ OpenAI package is available")
             else:
-                print("✗ OpenAI package not installed (will auto-install when needed)")
+                print("✗ OpenAI package not installed (install with: pip install openai)")
             return 0
         else:
             print("✗ OPENAI_API_KEY is not set")
@@ -214,13 +954,31 @@ Detail Levels:
             print("  export OPENAI_API_KEY='sk-...'")
             return 1
     
+    # Bulk directory mode
+    if args.batch:
+        api_key = get_api_key()
+        require_dependencies(collect_files(args.batch))
+        model = args.model or DEFAULT_MODELS[args.detail]
+        if args.concurrent:
+            failed = asyncio.run(summarize_concurrent(
+                args.batch, args.detail, model, api_key, args.concurrent,
+                use_cache=not args.no_cache, ttl=args.ttl))
+        elif args.pack:
+            failed = summarize_pack(args.batch, args.detail, model, api_key,
+                                    use_cache=not args.no_cache, ttl=args.ttl)
+        else:
+            failed = summarize_batch(args.batch, args.detail, model, api_key,
+                                     use_cache=not args.no_cache, ttl=args.ttl)
+        return 1 if failed else 0
+    
     # Normal summarization flow
     if not args.file_path:
         parser.print_help()
         sys.exit(1)
     
     # Get API key
-    api_key = get_api_key()
+    api_key = None if args.offline else get_api_key()
+    require_dependencies([args.file_path], offline=args.offline)
     
     # Read file
     print(f"Reading file: {args.file_path}", file=sys.stderr)
@@ -233,20 +991,47 @@ Detail Levels:
         print("ERROR: File appears to be empty or unreadable", file=sys.stderr)
         sys.exit(1)
     
-    print(f"File size: {len(content)} characters", file=sys.stderr)
-    print(f"Generating {args.detail} summary using {args.model}...", file=sys.stderr)
+    # A tiny file is already its own brief summary
+    if is_tiny(content, args.detail):
+        print(f"NOTE: File is under {TINY_FILE_CHARS} characters, showing it verbatim.", file=sys.stderr)
+        print("\n" + "="*60)
+        print(f"SUMMARY ({args.detail.upper()})")
+        print("="*60 + "\n")
+        print(content.strip())
+        print("\n" + "="*60)
+        return 0
     
-    # Generate summary
-    summary = summarize_content(content, args.detail, args.model, api_key)
+    detail = args.detail
+    if detail != 'brief' and len(content.strip()) < SHORT_FILE_CHARS:
+        print(f"NOTE: File is under {SHORT_FILE_CHARS} characters, using a brief summary.", file=sys.stderr)
+        detail = 'brief'
+    
+    model = args.model or DEFAULT_MODELS[detail]
+    if args.offline:
+        language = offline_language(content)
+        require_offline_language(language)
+        print(f"Generating {detail} summary offline ({language})...", file=sys.stderr)
+    else:
+        print(f"Generating {detail} summary using {model}...", file=sys.stderr)
+    
+    # Stream the summary to stdout as it is generated
+    print("\n" + "="*60)
+    print(f"SUMMARY ({detail.upper()})")
+    print("="*60 + "\n", flush=True)
+    if args.offline:
+        summary = summarize_offline(content, detail, language)
+        if summary is not None:
+            sys.stdout.write(summary)
+    else:
+        summary = summarize_content(content, detail, model, api_key,
+                                    use_cache=not args.no_cache, ttl=args.ttl,
+                                    semantic_cache=args.semantic_cache and not args.no_cache,
+                                    stream=sys.stdout)
     
     if summary is None:
         sys.exit(1)
     
-    # Output summary
-    print("\n" + "="*60)
-    print(f"SUMMARY ({args.detail.upper()})")
-    print("="*60 + "\n")
-    print(summary)
+    print()
     print("\n" + "="*60)
     
     return 0